@@ -43,3 +43,4 @@ DEFAULT_LOG_LEVEL_RASA_X = "WARNING"
 DEFAULT_LOG_LEVEL_LIBRARIES = "ERROR"
 ENV_LOG_LEVEL = "LOG_LEVEL"
 ENV_LOG_LEVEL_LIBRARIES = "LOG_LEVEL_LIBRARIES"
+ENV_YAML_CACHE_DIR = "RASA_YAML_CACHE_DIR"
@@ -1,23 +1,38 @@
 import asyncio
-import errno
+import hashlib
+import json
 import logging
 import os
-import tarfile
+import pickle
+import re
+import sys
 import tempfile
+import threading
 import warnings
-import zipfile
 from asyncio import AbstractEventLoop
-from typing import Text, Any, Dict, Union, List, Type
-import ruamel.yaml as yaml
-from io import BytesIO as IOReader
-
-import simplejson
+from functools import lru_cache
+from typing import Text, Any, Dict, Union, List, Tuple, Type
+from io import BytesIO as IOReader, StringIO
 import typing
 
-from rasa.constants import ENV_LOG_LEVEL, DEFAULT_LOG_LEVEL
+from rasa.constants import ENV_LOG_LEVEL, DEFAULT_LOG_LEVEL, ENV_YAML_CACHE_DIR
 
 if typing.TYPE_CHECKING:
+    from types import ModuleType
     from prompt_toolkit.validation import Validator
+    from ruamel.yaml import YAML
+
+logger = logging.getLogger(__name__)
+
+# buffer size for file I/O, the default of 8 KiB is slow for multi-MB files
+_IO_BUFSIZE = 1 << 18
+
+# signatures of a zip archive's first header (local file or empty archive)
+_ZIP_MAGIC_NUMBERS = (b"PK\x03\x04", b"PK\x05\x06")
+
+# file types which are already compressed and are stored as they are when zipped
+# (`.pkl`, `.h5` or `.npz` files written by rasa are not compressed)
+_INCOMPRESSIBLE_FILE_TYPES = {".gz", ".jpg", ".png", ".zip"}
 
 
 def configure_colored_logging(loglevel):
@@ -55,88 +70,288 @@ def enable_async_loop_debugging(event_loop: AbstractEventLoop) -> AbstractEventL
     return event_loop
 
 
-def fix_yaml_loader() -> None:
-    """Ensure that any string read by yaml is represented as unicode."""
-
-    def construct_yaml_str(self, node):
-        # Override the default string handling function
-        # to always return unicode objects
-        return self.construct_scalar(node)
-
-    yaml.Loader.add_constructor("tag:yaml.org,2002:str", construct_yaml_str)
-    yaml.SafeLoader.add_constructor("tag:yaml.org,2002:str", construct_yaml_str)
+# eg. ${USER_NAME}, ${PASSWORD}
+# The resolver is matched against every plain scalar. Every repetition of the
+# group has to end with a `$` which does not start a `${`, so there is only one
+# way to match and the pattern doesn't backtrack on values with many `${`.
+# `[^$]*` directly followed by `\$` lets the regex engine skip over values
+# without any `$` in a single scan.
+_ENV_VAR_PATTERN = re.compile(r"^(?:[^$]*\$(?!\{))*[^$]*\$\{[^}]+\}")
+
+
+def _split_braced_env_vars(value: Text) -> List[Tuple[Text, bool]]:
+    """Splits `value` into literal text and the values of `${NAME}` references.
+
+    Returns tuples of the text and whether it is literal text. References to
+    variables which are not set are kept as part of the literal text."""
+
+    parts = []
+    end = 0
+    start = value.find("${")
+    while start != -1:
+        close = value.find("}", start + 2)
+        if close == -1:
+            break
+
+        name = value[start + 2 : close]
+        if name in os.environ:
+            parts.append((value[end:start], True))
+            parts.append((os.environ[name], False))
+            end = close + 1
+        start = value.find("${", close + 1)
+
+    parts.append((value[end:], True))
+    return parts
+
+
+def _env_var_constructor(loader, node):
+    """Process environment variables found in the YAML."""
+    value = loader.construct_scalar(node)
+
+    expanded = []
+    not_expanded = []
+    for text, is_literal in _split_braced_env_vars(value):
+        # values of environment variables are inserted as they are, even if
+        # they contain a `$` (e.g. passwords)
+        if is_literal and "$" in text:
+            # e.g. `$NAME` without braces or variables which are not set
+            text = os.path.expandvars(text)
+            not_expanded += [w for w in text.split() if "$" in w]
+        expanded.append(text)
+
+    if not_expanded:
+        raise ValueError(
+            "Error when trying to expand the environment variables"
+            " in '{}'. Please make sure to also set these environment"
+            " variables: '{}'.".format(value, not_expanded)
+        )
+    return "".join(expanded)
 
 
 def replace_environment_variables():
     """Enable yaml loader to process the environment variables in the yaml."""
-    import re
-    import os
+    import ruamel.yaml as yaml
+
+    yaml.add_implicit_resolver("!env_var", _ENV_VAR_PATTERN)
+    yaml.SafeConstructor.add_constructor("!env_var", _env_var_constructor)
+
+
+# `ruamel.yaml` takes a while to import, hence it is only imported when needed
+_yaml = None
+# parsers and dumpers keep state while processing a document, hence every
+# thread gets its own instances
+_yaml_local = threading.local()
+
+
+def _get_yaml() -> "ModuleType":
+    """Imports `ruamel.yaml` and registers the env var constructor once."""
+    global _yaml
+
+    if _yaml is None:
+        import ruamel.yaml
+
+        replace_environment_variables()
+        _yaml = ruamel.yaml
+    return _yaml
+
+
+def _get_yaml_parser() -> "YAML":
+    """Returns the yaml parser which is shared by all reads of this thread.
+
+    `YAML.load` resets the parser state, so a single instance can be reused."""
+
+    yaml_parser = getattr(_yaml_local, "parser", None)
+    if yaml_parser is None:
+        yaml_parser = _get_yaml().YAML(typ="safe")
+        yaml_parser.version = "1.2"
+        yaml_parser.unicode_supplementary = True
+        _yaml_local.parser = yaml_parser
+    return yaml_parser
+
 
-    # eg. ${USER_NAME}, ${PASSWORD}
-    env_var_pattern = re.compile(r"^(.*)\$\{(.*)\}(.*)$")
-    yaml.add_implicit_resolver("!env_var", env_var_pattern)
+def _get_yaml_dumper() -> "YAML":
+    """Returns the yaml dumper which is shared by all writes of this thread.
 
-    def env_var_constructor(loader, node):
-        """Process environment variables found in the YAML."""
-        value = loader.construct_scalar(node)
-        expanded_vars = os.path.expandvars(value)
-        if "$" in expanded_vars:
-            not_expanded = [w for w in expanded_vars.split() if "$" in w]
-            raise ValueError(
-                "Error when trying to expand the environment variables"
-                " in '{}'. Please make sure to also set these environment"
-                " variables: '{}'.".format(value, not_expanded)
-            )
-        return expanded_vars
+    It uses the C based emitter of `ruamel.yaml.clib` if it is installed."""
 
-    yaml.SafeConstructor.add_constructor("!env_var", env_var_constructor)
+    yaml_dumper = getattr(_yaml_local, "dumper", None)
+    if yaml_dumper is None:
+        yaml_dumper = _get_yaml().YAML(typ="safe", pure=False)
+        yaml_dumper.default_flow_style = False
+        _yaml_local.dumper = yaml_dumper
+    return yaml_dumper
 
 
 def read_yaml(content: Text) -> Union[List[Any], Dict[Text, Any]]:
     """Parses yaml from a text.
 
+    Results for content without environment variables are cached, so repeated
+    reads of the same file are not parsed again.
+
      Args:
         content: A text containing yaml content.
     """
-    fix_yaml_loader()
-    replace_environment_variables()
+    if "$" in content:
+        # environment variables are expanded while parsing, hence the result
+        # depends on the current environment and must not be cached
+        return _parse_yaml(content)
+
+    # callers are allowed to modify the result, so hand out a copy of the
+    # cached value (a pickle round trip is faster than `copy.deepcopy`)
+    cached = _read_yaml_cached(content)
+    return pickle.loads(pickle.dumps(cached, pickle.HIGHEST_PROTOCOL))
+
+
+@lru_cache(maxsize=128)
+def _read_yaml_cached(content: Text) -> Union[List[Any], Dict[Text, Any]]:
+    return _parse_yaml(content)
+
 
-    yaml_parser = yaml.YAML(typ="safe")
-    yaml_parser.version = "1.2"
-    yaml_parser.unicode_supplementary = True
+def _parse_yaml(content: Text) -> Union[List[Any], Dict[Text, Any]]:
+    yaml = _get_yaml()
+    yaml_parser = _get_yaml_parser()
 
     # noinspection PyUnresolvedReferences
     try:
-        return yaml_parser.load(content) or {}
+        return _intern_strings(yaml_parser.load(content) or {})
     except yaml.scanner.ScannerError:
         # A `ruamel.yaml.scanner.ScannerError` might happen due to escaped
         # unicode sequences that form surrogate pairs. Try converting the input
         # to a parsable format based on
         # https://stackoverflow.com/a/52187065/3429596.
+        # Without any escaped surrogate the conversion can't help, so don't
+        # parse the content a second time.
+        if not _needs_surrogate_fix(content):
+            raise
+
         content = (
             content.encode("utf-8")
             .decode("raw_unicode_escape")
             .encode("utf-16", "surrogatepass")
             .decode("utf-16")
         )
-        return yaml_parser.load(content) or {}
+        return _intern_strings(yaml_parser.load(content) or {})
+
+
+# escaped unicode sequences in the surrogate range (U+D800 - U+DFFF)
+_ESCAPED_SURROGATE_PATTERN = re.compile(r"\\u[dD][89a-fA-F][0-9a-fA-F]{2}")
+
+
+def _needs_surrogate_fix(content: Text) -> bool:
+    """Checks if `content` contains escaped surrogates."""
+
+    # the substring check is a lot cheaper than the regex for the common case
+    return "\\u" in content and _ESCAPED_SURROGATE_PATTERN.search(content) is not None
+
+
+# short identifier like values, e.g. intent, entity or slot names
+_INTERNABLE_VALUE_PATTERN = re.compile(r"[a-z_][a-z0-9_]{0,31}\Z")
+
+
+def _intern_strings(data: Any) -> Any:
+    """Interns all dictionary keys and identifier like values in `data`.
+
+    Training data repeats the same keys (e.g. `intent`, `entities`) and names
+    thousands of times. Interned, every distinct string is only stored once.
+    """
+
+    stack = []
+    # yaml aliases share containers and can even be recursive, every
+    # container must only be visited once
+    visited = set()
+
+    def intern_value(value: Any) -> Any:
+        if isinstance(value, str):
+            if _INTERNABLE_VALUE_PATTERN.match(value):
+                return sys.intern(value)
+        elif isinstance(value, (dict, list)) and id(value) not in visited:
+            visited.add(id(value))
+            stack.append(value)
+        return value
+
+    data = intern_value(data)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            items = list(node.items())
+            node.clear()
+            for key, value in items:
+                if isinstance(key, str):
+                    key = sys.intern(key)
+                node[key] = intern_value(value)
+        else:
+            for i, value in enumerate(node):
+                node[i] = intern_value(value)
+
+    return data
 
 
 def read_file(filename: Text, encoding: Text = "utf-8") -> Any:
     """Read text from a file."""
 
     try:
-        with open(filename, encoding=encoding) as f:
+        with open(filename, encoding=encoding, buffering=_IO_BUFSIZE) as f:
+            return f.read()
+    except FileNotFoundError:
+        raise ValueError("File '{}' does not exist.".format(filename))
+
+
+def read_file_bytes(filename: Text) -> bytes:
+    """Read the raw bytes of a file."""
+
+    try:
+        with open(filename, "rb", buffering=_IO_BUFSIZE) as f:
             return f.read()
     except FileNotFoundError:
         raise ValueError("File '{}' does not exist.".format(filename))
 
 
+@lru_cache(maxsize=None)
+def _get_orjson() -> typing.Optional["ModuleType"]:
+    """Imports `orjson` on first use, returns `None` if it is not installed."""
+
+    try:
+        import orjson
+
+        return orjson
+    except ImportError:
+        return None
+
+
+# maps all digits to `0`, so that runs of digits can be found with a plain
+# substring search, which is a lot faster than a regex
+_DIGITS_TO_ZERO = bytes.maketrans(b"123456789", b"000000000")
+# integers outside of the 64 bit range have at least 19 digits
+_LONG_DIGIT_RUN = b"0" * 19
+
+
+def _json_loads(content: bytes) -> Any:
+    """Parses json using `orjson` if it is installed.
+
+    `orjson` turns integers which don't fit into 64 bits into floats, so
+    content with long runs of digits is parsed with `json` to keep them exact."""
+
+    orjson = _get_orjson()
+    if orjson is not None and _LONG_DIGIT_RUN not in content.translate(_DIGITS_TO_ZERO):
+        try:
+            return orjson.loads(content)
+        except ValueError:
+            # `orjson` is stricter than `json`, e.g. it does not accept `NaN`,
+            # so give `json` a chance before failing
+            pass
+
+    if sys.version_info < (3, 6):
+        # `json.loads` only accepts bytes since Python 3.6
+        content = content.decode("utf-8")
+    return json.loads(content)
+
+
 def read_json_file(filename: Text) -> Any:
     """Read json from a file."""
-    content = read_file(filename)
+    # json parsers work on bytes, no need to decode the content first
+    content = read_file_bytes(filename)
     try:
-        return simplejson.loads(content)
+        return _json_loads(content)
     except ValueError as e:
         raise ValueError(
             "Failed to read json from '{}'. Error: "
@@ -150,7 +365,7 @@ def read_config_file(filename: Text) -> Dict[Text, Any]:
      Args:
         filename: The path to the file which should be read.
     """
-    content = read_yaml(read_file(filename, "utf-8"))
+    content = _load_with_json_cache(filename)
 
     if content is None:
         return {}
@@ -170,24 +385,112 @@ def read_yaml_file(filename: Text) -> Union[List[Any], Dict[Text, Any]]:
      Args:
         filename: The path to the file which should be read.
     """
-    return read_yaml(read_file(filename, "utf-8"))
+    return _load_with_json_cache(filename)
+
+
+def _load_with_json_cache(filename: Text) -> Union[List[Any], Dict[Text, Any]]:
+    """Parses a yaml file and caches the result as json if caching is enabled.
+
+    Loading json is a lot faster than parsing yaml. The cache is opt-in: it is
+    only used if the environment variable `RASA_YAML_CACHE_DIR` points to the
+    directory which should hold the cache files. A cached result is only used
+    if the hash of the yaml file's content still matches.
+    """
+    cache_directory = os.environ.get(ENV_YAML_CACHE_DIR)
+    if not cache_directory:
+        return read_yaml(read_file(filename, "utf-8"))
+
+    raw_content = read_file_bytes(filename)
+    content_hash = hashlib.sha256(raw_content).hexdigest()
+    path_hash = hashlib.sha256(os.path.abspath(filename).encode("utf-8")).hexdigest()
+    cache_file = os.path.join(cache_directory, path_hash + ".json")
+
+    try:
+        cached = _json_loads(read_file_bytes(cache_file))
+        if cached["hash"] == content_hash:
+            return cached["data"]
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        # no cache yet, the cache is corrupted or it can't be read, e.g. the
+        # cache directory is a file - the cache is only an optimization
+        logger.debug("Failed to read yaml cache '{}': {}".format(cache_file, e))
+
+    content = raw_content.decode("utf-8")
+    data = read_yaml(content)
+
+    # the result of environment variable expansion must not be persisted
+    if "$" not in content and _is_json_serializable(data):
+        _write_json_cache({"hash": content_hash, "data": data}, cache_file)
+
+    return data
+
+
+def _is_json_serializable(data: Any) -> bool:
+    """Checks if `data` survives a json round trip without changing.
+
+    Containers which are referenced more than once (yaml aliases) are rejected,
+    since json would duplicate them or, for recursive data, fail."""
+
+    seen = set()
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if node is None or isinstance(node, (str, bool, int, float)):
+            continue
+        elif isinstance(node, (list, dict)):
+            if id(node) in seen:
+                return False
+            seen.add(id(node))
+
+            if isinstance(node, dict):
+                if not all(isinstance(k, str) for k in node):
+                    return False
+                stack.extend(node.values())
+            else:
+                stack.extend(node)
+        else:
+            return False
+
+    return True
+
+
+def _write_json_cache(data: Any, cache_file: Text) -> None:
+    """Atomically writes `data` to the json cache file `cache_file`."""
+
+    directory = os.path.dirname(os.path.abspath(cache_file))
+    temp_file = None
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            mode="w", dir=directory, delete=False, encoding="utf-8"
+        ) as f:
+            temp_file = f.name
+            f.write(json.dumps(data))
+        os.replace(temp_file, cache_file)
+    except (OSError, TypeError) as e:
+        # the cache is only an optimization, e.g. the directory might be read-only
+        logger.debug("Failed to cache yaml file as '{}': {}".format(cache_file, e))
+        if temp_file and os.path.exists(temp_file):
+            os.remove(temp_file)
 
 
 def unarchive(byte_array: bytes, directory: Text) -> Text:
     """Tries to unpack a byte array interpreting it as an archive.
 
-    Tries to use tar first to unpack, if that fails, zip will be used."""
+    Zip archives are detected by their magic number, anything else is
+    unpacked as a (possibly compressed) tar archive."""
+    import tarfile
+    import zipfile
 
-    try:
-        tar = tarfile.open(fileobj=IOReader(byte_array))
-        tar.extractall(directory)
-        tar.close()
-        return directory
-    except tarfile.TarError:
-        zip_ref = zipfile.ZipFile(IOReader(byte_array))
-        zip_ref.extractall(directory)
-        zip_ref.close()
-        return directory
+    # `BytesIO` shares the memory of a `bytes` object until it is written to,
+    # so wrapping `byte_array` does not copy the archive
+    if byte_array[:4] in _ZIP_MAGIC_NUMBERS:
+        with zipfile.ZipFile(IOReader(byte_array)) as zip_ref:
+            zip_ref.extractall(directory)
+    else:
+        # the archive is read sequentially, so the streaming mode is sufficient
+        with tarfile.open(fileobj=IOReader(byte_array), mode="r|*") as tar:
+            tar.extractall(directory)
+    return directory
 
 
 def write_yaml_file(data: Dict, filename: Text):
@@ -197,18 +500,40 @@ def write_yaml_file(data: Dict, filename: Text):
         data: The data to write.
         filename: The path to the file which should be written.
     """
-    with open(filename, "w", encoding="utf-8") as outfile:
-        yaml.dump(data, outfile, default_flow_style=False)
+    # the emitter produces lots of tiny strings, writing them to the file one
+    # by one is a lot slower than a single write of the whole document
+    buffer = StringIO()
+    _get_yaml_dumper().dump(data, buffer)
+
+    with open(filename, "wb") as outfile:
+        outfile.write(buffer.getvalue().encode("utf-8"))
 
 
 def is_subdirectory(path: Text, potential_parent_directory: Text) -> bool:
     if path is None or potential_parent_directory is None:
         return False
 
-    path = os.path.abspath(path)
-    potential_parent_directory = os.path.abspath(potential_parent_directory)
+    path = _absolute_path(path)
+    potential_parent_directory = _absolute_path(potential_parent_directory)
+
+    try:
+        common_path = os.path.commonpath([path, potential_parent_directory])
+    except ValueError:
+        # e.g. the paths are on different drives
+        return False
+
+    return common_path == potential_parent_directory
+
+
+def _absolute_path(path: Text) -> Text:
+    # `abspath` needs to look up the working directory, which can be skipped
+    # for paths which are absolute already
+    if os.path.isabs(path):
+        path = os.path.normpath(path)
+    else:
+        path = os.path.abspath(path)
 
-    return potential_parent_directory in path
+    return os.path.normcase(path)
 
 
 def create_temporary_file(data: Any, suffix: Text = "", mode: Text = "w+") -> Text:
@@ -218,7 +543,11 @@ def create_temporary_file(data: Any, suffix: Text = "", mode: Text = "w+") -> Te
 
     encoding = None if "b" in mode else "utf-8"
     f = tempfile.NamedTemporaryFile(
-        mode=mode, suffix=suffix, delete=False, encoding=encoding
+        mode=mode,
+        suffix=suffix,
+        delete=False,
+        encoding=encoding,
+        buffering=_IO_BUFSIZE,
     )
     f.write(data)
 
@@ -230,31 +559,43 @@ def create_path(file_path: Text):
     """Makes sure all directories in the 'file_path' exists."""
 
     parent_dir = os.path.dirname(os.path.abspath(file_path))
-    if not os.path.exists(parent_dir):
-        os.makedirs(parent_dir)
+    os.makedirs(parent_dir, exist_ok=True)
 
 
 def zip_folder(folder: Text) -> Text:
     """Create an archive from a folder."""
     import tempfile
-    import shutil
+    import zipfile
 
-    zipped_path = tempfile.NamedTemporaryFile(delete=False)
+    zipped_path = tempfile.NamedTemporaryFile(delete=False, suffix=".zip")
     zipped_path.close()
 
-    # WARN: not thread save!
-    return shutil.make_archive(zipped_path.name, str("zip"), folder)
+    options = {"compression": zipfile.ZIP_DEFLATED}
+    if sys.version_info >= (3, 7):
+        # the fastest compression level is good enough for model files,
+        # most of their size are weights which barely compress anyway
+        options["compresslevel"] = 1
+
+    with zipfile.ZipFile(zipped_path.name, "w", **options) as zip_file:
+        for root, directories, files in os.walk(folder):
+            for name in sorted(directories) + sorted(files):
+                path = os.path.join(root, name)
+                compress_type = None  # default of the archive
+                if os.path.splitext(name)[1].lower() in _INCOMPRESSIBLE_FILE_TYPES:
+                    compress_type = zipfile.ZIP_STORED
+                # `write` streams the file in chunks instead of reading it at once
+                zip_file.write(
+                    path, os.path.relpath(path, folder), compress_type=compress_type
+                )
+
+    return zipped_path.name
 
 
 def create_directory_for_file(file_path: Text) -> None:
     """Creates any missing parent directories of this file path."""
 
-    try:
-        os.makedirs(os.path.dirname(file_path))
-    except OSError as e:
-        # be happy if someone already created the path
-        if e.errno != errno.EEXIST:
-            raise
+    # be happy if someone already created the path
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
 
 
 def questionary_file_path_validator(
@@ -267,12 +608,13 @@ def questionary_file_path_validator(
     from prompt_toolkit.validation import Validator, ValidationError
     from prompt_toolkit.document import Document
 
+    # `str.endswith` accepts a tuple of suffixes
+    valid_suffixes = tuple(valid_file_types)
+
     class ExportPathValidator(Validator):
         def validate(self, document: Document) -> None:
             path = document.text
-            is_valid = path is not None and any(
-                [path.endswith(file_type) for file_type in valid_file_types]
-            )
+            is_valid = path is not None and path.endswith(valid_suffixes)
             if not is_valid:
                 raise ValidationError(message=error_message)
 
@@ -149,13 +149,23 @@ def test_read_yaml_string_with_env_var_not_exist():
         rasa.utils.io.read_yaml(config_with_env_var_not_exist)
 
 
-@pytest.mark.parametrize("file, parents", [("A/test.md", "A"), ("A", "A")])
+@pytest.mark.parametrize(
+    "file, parents", [("A/test.md", "A"), ("A", "A"), ("/A/B/../test.md", "/A")]
+)
 def test_file_in_path(file, parents):
     assert rasa.utils.io.is_subdirectory(file, parents)
 
 
 @pytest.mark.parametrize(
-    "file, parents", [("A", "A/B"), ("B", "A"), ("A/test.md", "A/B"), (None, "A")]
+    "file, parents",
+    [
+        ("A", "A/B"),
+        ("B", "A"),
+        ("A/test.md", "A/B"),
+        (None, "A"),
+        ("AB/test.md", "A"),
+        ("B/A/test.md", "A"),
+    ],
 )
 def test_file_not_in_path(file, parents):
     assert not rasa.utils.io.is_subdirectory(file, parents)
@@ -5,6 +5,7 @@ import pickle
 import pytest
 import tempfile
 import rasa.utils.io
+from rasa.constants import ENV_YAML_CACHE_DIR
 from rasa.nlu import utils
 from rasa.nlu.utils import (
     create_dir,
@@ -169,6 +170,34 @@ def test_environment_variable_dict_with_prefix_and_with_postfix():
     assert result["model"]["test"] == "dir/test/dir"
 
 
+def test_multiple_environment_variables_in_one_value():
+    os.environ["variable"] = "test"
+    os.environ["other_variable"] = "other"
+    content = "model: \n  test: ${variable}/${other_variable}/dir"
+
+    result = rasa.utils.io.read_yaml(content)
+
+    assert result["model"]["test"] == "test/other/dir"
+
+
+def test_environment_variable_with_dollar_in_value(monkeypatch):
+    monkeypatch.setenv("PASSWORD", "ab$HOME")
+    content = "password: ${PASSWORD}"
+
+    result = rasa.utils.io.read_yaml(content)
+
+    assert result["password"] == "ab$HOME"
+
+
+def test_many_unclosed_environment_variable_braces():
+    # must not backtrack quadratically over the `${` occurrences
+    content = "text: " + "${a" * 5000
+
+    result = rasa.utils.io.read_yaml(content)
+
+    assert result["text"] == "${a" * 5000
+
+
 def test_emojis_in_yaml():
     test_data = """
     data:
@@ -222,6 +251,130 @@ def test_bool_str():
     assert actual["three"] == "True"
 
 
+def test_read_yaml_returns_independent_copies():
+    content = "data:\n  - one\n  - two"
+
+    first = rasa.utils.io.read_yaml(content)
+    first["data"].append("three")
+
+    second = rasa.utils.io.read_yaml(content)
+
+    assert second["data"] == ["one", "two"]
+
+
+def test_write_yaml_file_with_unicode(tmpdir):
+    yaml_file = tmpdir.join("domain.yml").strpath
+    data = {"templates": {"utter_greet": [{"text": "hey 😁 für"}]}}
+
+    rasa.utils.io.write_yaml_file(data, yaml_file)
+
+    # the emitter escapes characters beyond the BMP, e.g. emojis
+    assert "für" in rasa.utils.io.read_file(yaml_file)
+    assert rasa.utils.io.read_yaml_file(yaml_file) == data
+
+
+def test_read_yaml_from_multiple_threads():
+    from concurrent.futures import ThreadPoolExecutor
+
+    contents = ["intent_{}: [{}]".format(i, ", ".join(["a"] * 100)) for i in range(50)]
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(rasa.utils.io.read_yaml, contents))
+
+    for i, result in enumerate(results):
+        assert result == {"intent_{}".format(i): ["a"] * 100}
+
+
+def test_read_yaml_with_recursive_alias():
+    actual = rasa.utils.io.read_yaml("a: &x\n  b: *x\n")
+
+    assert actual["a"]["b"] is actual["a"]
+
+
+def test_read_yaml_with_many_aliases():
+    # every level references the previous one ten times, walking the aliases
+    # instead of the distinct nodes would take 10^7 steps
+    lines = ["l0: &l0 [intent]"]
+    for i in range(1, 8):
+        lines.append(
+            "l{}: &l{} [{}]".format(i, i, ", ".join(["*l{}".format(i - 1)] * 10))
+        )
+    content = "\n".join(lines)
+
+    actual = rasa.utils.io.read_yaml(content)
+
+    assert actual["l7"][0][0][0][0][0][0][0] == ["intent"]
+
+
+def test_read_yaml_file_does_not_cache_by_default(tmpdir):
+    yaml_file = tmpdir.join("config.yml")
+    yaml_file.write("language: en")
+
+    assert io_utils.read_yaml_file(yaml_file.strpath) == {"language": "en"}
+    assert tmpdir.listdir() == [yaml_file]
+
+
+def test_read_yaml_file_writes_json_cache(tmpdir, monkeypatch):
+    cache_directory = tmpdir.join("cache")
+    monkeypatch.setenv(ENV_YAML_CACHE_DIR, cache_directory.strpath)
+    yaml_file = tmpdir.join("config.yml")
+    yaml_file.write("pipeline:\n  - name: tokenizer_whitespace")
+
+    expected = {"pipeline": [{"name": "tokenizer_whitespace"}]}
+
+    assert io_utils.read_yaml_file(yaml_file.strpath) == expected
+    assert len(cache_directory.listdir()) == 1
+    assert io_utils.read_yaml_file(yaml_file.strpath) == expected
+
+
+def test_read_yaml_file_json_cache_checks_content(tmpdir, monkeypatch):
+    monkeypatch.setenv(ENV_YAML_CACHE_DIR, tmpdir.join("cache").strpath)
+    yaml_file = tmpdir.join("config.yml")
+    yaml_file.write("language: aa")
+    assert io_utils.read_yaml_file(yaml_file.strpath) == {"language": "aa"}
+
+    # same size and modification time, e.g. after `cp -p`
+    mtime = yaml_file.mtime()
+    yaml_file.write("language: bb")
+    yaml_file.setmtime(mtime)
+
+    assert io_utils.read_yaml_file(yaml_file.strpath) == {"language": "bb"}
+
+
+def test_read_yaml_file_does_not_cache_environment_variables(tmpdir, monkeypatch):
+    cache_directory = tmpdir.join("cache")
+    monkeypatch.setenv(ENV_YAML_CACHE_DIR, cache_directory.strpath)
+    monkeypatch.setenv("variable", "test")
+    yaml_file = tmpdir.join("endpoints.yml")
+    yaml_file.write("password: ${variable}")
+
+    assert io_utils.read_yaml_file(yaml_file.strpath) == {"password": "test"}
+    assert not cache_directory.check()
+
+
+def test_read_yaml_file_with_recursive_alias_and_json_cache(tmpdir, monkeypatch):
+    cache_directory = tmpdir.join("cache")
+    monkeypatch.setenv(ENV_YAML_CACHE_DIR, cache_directory.strpath)
+    yaml_file = tmpdir.join("config.yml")
+    yaml_file.write("a: &x\n  b: *x\n")
+
+    actual = io_utils.read_yaml_file(yaml_file.strpath)
+
+    assert actual["a"]["b"] is actual["a"]
+    assert not cache_directory.check()
+
+
+def test_read_yaml_file_with_cache_directory_being_a_file(tmpdir, monkeypatch):
+    not_a_directory = tmpdir.join("cache")
+    not_a_directory.write("")
+    monkeypatch.setenv(ENV_YAML_CACHE_DIR, not_a_directory.strpath)
+    yaml_file = tmpdir.join("config.yml")
+    yaml_file.write("a: 1")
+
+    assert io_utils.read_yaml_file(yaml_file.strpath) == {"a": 1}
+    assert io_utils.read_config_file(yaml_file.strpath) == {"a": 1}
+
+
 def test_default_token_name():
     test_data = {"url": "http://test", "token": "token"}
 
@@ -125,6 +125,74 @@ def test_read_file_with_not_existing_path():
         rasa.utils.io.read_file("some path")
 
 
+def test_read_file_bytes_with_not_existing_path():
+    with pytest.raises(ValueError):
+        rasa.utils.io.read_file_bytes("some path")
+
+
+@pytest.mark.parametrize(
+    "number",
+    [
+        123456789012345678901234567890,
+        18446744073709551616,
+        -9223372036854775809,
+        9223372036854775807,
+    ],
+)
+def test_read_json_file_keeps_big_integers(tmpdir, number):
+    json_file = tmpdir.join("file.json")
+    json_file.write('{{"a": {}, "b": 1.5}}'.format(number))
+
+    actual = rasa.utils.io.read_json_file(json_file.strpath)
+
+    assert actual == {"a": number, "b": 1.5}
+    assert isinstance(actual["a"], int)
+
+
+@pytest.mark.parametrize("archive_format", ["zip", "gztar", "tar"])
+def test_unarchive(tmpdir, archive_format):
+    import shutil
+
+    source = tmpdir.mkdir("source")
+    source.mkdir("nested").join("file.txt").write("content")
+    archive = shutil.make_archive(
+        tmpdir.join("archive").strpath, archive_format, source.strpath
+    )
+    with open(archive, "rb") as f:
+        byte_array = f.read()
+
+    target = tmpdir.mkdir("target")
+    rasa.utils.io.unarchive(byte_array, target.strpath)
+
+    assert target.join("nested", "file.txt").read() == "content"
+
+
+def test_zip_folder(tmpdir):
+    import zipfile
+
+    source = tmpdir.mkdir("source")
+    source.mkdir("nested").join("file.txt").write("content")
+    source.join("model.pkl").write("weights")
+    source.join("image.png").write("pixels")
+    source.mkdir("empty")
+
+    zipped_path = rasa.utils.io.zip_folder(source.strpath)
+
+    with zipfile.ZipFile(zipped_path) as zip_file:
+        assert zip_file.getinfo("image.png").compress_type == zipfile.ZIP_STORED
+        assert zip_file.getinfo("model.pkl").compress_type == zipfile.ZIP_DEFLATED
+        assert zip_file.getinfo("nested/file.txt").compress_type == zipfile.ZIP_DEFLATED
+
+    target = tmpdir.mkdir("target")
+    with open(zipped_path, "rb") as f:
+        rasa.utils.io.unarchive(f.read(), target.strpath)
+
+    assert target.join("nested", "file.txt").read() == "content"
+    assert target.join("model.pkl").read() == "weights"
+    assert target.join("image.png").read() == "pixels"
+    assert target.join("empty").check(dir=True)
+
+
 @pytest.mark.parametrize("actual_path", ["", "file.md", "file"])
 def test_file_path_validator_with_invalid_paths(actual_path):
     from prompt_toolkit.validation import ValidationError